@@ -1,61 +1,298 @@
+import argparse
+import asyncio
+import copy
+import io
+import ipaddress
+import select
+import shelve
+import socket
+import time
+import dns.asyncresolver
+import dns.flags
+import dns.message
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
 import dns.resolver
 import dns.exception
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
+from docx.oxml import OxmlElement, parse_xml
 from datetime import datetime
-from docx.oxml.ns import qn
+from pathlib import Path
+from docx.oxml.ns import nsdecls, qn
+from xml.sax.saxutils import escape
 
-def resolve_hostname_to_ip(hostname):
+DEFAULT_TIMEOUT = 3.0  # seconds allowed per query, retries included
+
+# Well-peered public resolvers instead of the system stub; --resolver replaces the first one.
+PRIMARY_NAMESERVER = "1.1.1.1"
+FALLBACK_NAMESERVER = "8.8.8.8"
+
+_resolver = dns.asyncresolver.Resolver(configure=False)
+_resolver.nameservers = [PRIMARY_NAMESERVER, FALLBACK_NAMESERVER]
+_resolver.lifetime = DEFAULT_TIMEOUT
+_resolver.timeout = 1.5
+_resolver.cache = dns.resolver.LRUCache(max_size=1000)
+
+DNS_CACHE_FILE = "dns_cache.db"
+MAX_CACHE_TTL = 900  # never trust a cached RRset for longer than this, whatever its TTL
+
+# On-disk cache shared between runs, opened by __main__ unless --no-cache is given.
+_disk_cache = None
+
+def _cache_key(qname, rdtype, resolver):
+    # The servers asked are part of the key, so switching --resolver never reuses old answers.
+    nameservers = ",".join(str(ns) for ns in (resolver or _resolver).nameservers)
+    return f"{nameservers}|{qname.lower().rstrip('.')}|{rdtype}"
+
+def _cache_get(qname, rdtype, resolver=None):
+    """Return the cached RRset for (qname, rdtype) if it hasn't expired, else None."""
+    if _disk_cache is None:
+        return None
+    key = _cache_key(qname, rdtype, resolver)
+    entry = _disk_cache.get(key)
+    if entry is None:
+        return None
+    expires, ttl, texts = entry
+    if expires <= time.time():
+        del _disk_cache[key]
+        return None
+    return dns.rrset.from_text_list(qname, ttl, dns.rdataclass.IN, rdtype, texts)
+
+def _cache_put(qname, rdtype, rrset, resolver=None):
+    if _disk_cache is None:
+        return
+    ttl = min(rrset.ttl, MAX_CACHE_TTL)
+    _disk_cache[_cache_key(qname, rdtype, resolver)] = (
+        time.time() + ttl, ttl, [rdata.to_text() for rdata in rrset])
+
+def _prune_disk_cache():
+    """Drop every expired entry so the cache file doesn't grow forever."""
+    now = time.time()
+    for key in [key for key, (expires, _, _) in _disk_cache.items() if expires <= now]:
+        del _disk_cache[key]
+
+async def _resolve(qname, rdtype, lifetime, resolver=None, raise_on_no_answer=True):
+    """Return the answer RRset (None if empty), going through the disk cache when enabled."""
+    cached = _cache_get(qname, rdtype, resolver)
+    if cached is not None:
+        return cached
+
+    answers = await (resolver or _resolver).resolve(
+        qname, rdtype, lifetime=lifetime, search=False, raise_on_no_answer=raise_on_no_answer)
+    if answers.rrset is not None:
+        _cache_put(qname, rdtype, answers.rrset, resolver)
+    return answers.rrset
+
+async def _try(hostname, record_type, lifetime):
+    """Return the first address of the given type, or None if the name has none."""
     try:
-        answers = dns.resolver.resolve(hostname, 'A')
-        for rdata in answers:
-            return str(rdata)
-    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-        pass
+        rrset = await _resolve(hostname, record_type, lifetime, raise_on_no_answer=False)
+    except dns.resolver.NXDOMAIN:
+        return None
+    return str(rrset[0]) if rrset else None
+
+async def resolve_hostname_to_ip_async(hostname, lifetime=DEFAULT_TIMEOUT):
+    # Repeat lookups are answered from _resolver.cache, which honors TTLs.
+    # A and AAAA are queried in parallel; the first address to arrive wins.
+    tasks = [asyncio.ensure_future(_try(hostname, rt, lifetime)) for rt in ("A", "AAAA")]
+    result = "N/A"
     try:
-        answers = dns.resolver.resolve(hostname, 'AAAA')
-        for rdata in answers:
-            return str(rdata)
-    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-        pass
-    except dns.exception.Timeout:
-        return "Time limit exceeded"
-    except Exception:
-        return "N/A"
-    return "N/A"
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                ip = await next_done
+            except dns.exception.Timeout:
+                result = "Time limit exceeded"
+                continue
+            except Exception:
+                continue
+            if ip:
+                return ip
+    finally:
+        for task in tasks:
+            task.cancel()
+    return result
 
-def get_dns_records(domain):
-    records = {"A": [], "AAAA": [], "MX": [], "NS": [], "TXT": [], "CNAME": []}
-    record_types = list(records.keys())
+def batch_resolve(hostnames, timeout=DEFAULT_TIMEOUT):
+    """Send one A query per hostname over a single UDP socket; return {hostname: A rrset}."""
+    results = {}
+    # Only the first nameserver is asked, and only if it is a plain IP (not e.g. DoH).
+    try:
+        server = ipaddress.ip_address(str(_resolver.nameservers[0]))
+    except (IndexError, ValueError):
+        return results
+    if not hostnames:
+        return results
+    family = socket.AF_INET6 if server.version == 6 else socket.AF_INET
 
-    for record_type in record_types:
+    pending = {}  # txid -> (hostname, query)
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            for hostname in hostnames:
+                query = dns.message.make_query(hostname, "A")
+                while query.id in pending:
+                    query = dns.message.make_query(hostname, "A")
+                pending[query.id] = (hostname, query)
+                sock.sendto(query.to_wire(), (str(server), _resolver.port))
+
+            # No retransmits: whatever isn't answered by the deadline is left to the caller.
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                    break
+                wire, source = sock.recvfrom(65535)
+                if ipaddress.ip_address(source[0].split("%")[0]) != server:
+                    continue
+                try:
+                    response = dns.message.from_wire(wire)
+                except dns.exception.DNSException:
+                    continue
+                if response.id not in pending:
+                    continue
+                hostname, query = pending[response.id]
+                if not query.is_response(response):
+                    continue
+                del pending[response.id]
+                if response.flags & dns.flags.TC:
+                    continue
+                for rrset in response.answer:
+                    if rrset.rdtype == dns.rdatatype.A:
+                        results[hostname] = rrset
+                        break
+    except OSError:
+        pass  # network trouble; whatever is missing gets resolved the regular way
+    return results
+
+async def _resolve_hostnames(hostnames, timeout):
+    """Resolve many hostnames: one UDP batch for A records, then the stragglers one by one."""
+    started = time.monotonic()
+    # The disk cache stays on this thread (sqlite-backed shelves refuse other threads);
+    # cached names skip the batch and are answered from the cache below.
+    todo = [h for h in hostnames if _cache_get(h, "A") is None]
+    # The batch gets one per-server timeout at most, never more than half the budget...
+    rrsets = await asyncio.to_thread(batch_resolve, todo, min(_resolver.timeout, timeout / 2))
+    ip_by_host = {}
+    for hostname, rrset in rrsets.items():
+        _cache_put(hostname, "A", rrset)
+        ip_by_host[hostname] = str(rrset[0])
+    # ...and the stragglers share what is left of it.
+    remaining = timeout - (time.monotonic() - started)
+    missing = [h for h in hostnames if h not in ip_by_host]
+    ips = await asyncio.gather(*(resolve_hostname_to_ip_async(h, remaining) for h in missing))
+    ip_by_host.update(zip(missing, ips))
+    return ip_by_host
+
+def _authority_resolver(ns_ips, lifetime):
+    """Build a resolver that talks straight to the zone's name servers, or None if none resolved."""
+    nameservers = []
+    for ip in ns_ips:
         try:
-            answers = dns.resolver.resolve(domain, record_type)
-            for rdata in answers:
-                if record_type == "MX":
-                    exchange = str(rdata.exchange).rstrip('.')
-                    ip = resolve_hostname_to_ip(exchange)
-                    records["MX"].append({"priority": rdata.preference, "exchange": exchange, "ip": ip})
-                elif record_type == "NS":
-                    ns_name = str(rdata).rstrip('.')
-                    ip = resolve_hostname_to_ip(ns_name)
-                    records["NS"].append({"name": ns_name, "ip": ip})
-                else:
-                    records[record_type].append(str(rdata).rstrip('.'))
-        except dns.resolver.NoAnswer:
-            continue
+            nameservers.append(str(ipaddress.ip_address(ip)))
+        except ValueError:
+            continue  # "N/A" / "Time limit exceeded"
+    if not nameservers:
+        return None
+    resolver = dns.asyncresolver.Resolver(configure=False)
+    resolver.nameservers = nameservers
+    resolver.lifetime = lifetime
+    resolver.timeout = _resolver.timeout
+    resolver.cache = _resolver.cache
+    return resolver
+
+async def _resolve_at_authority(qname, rdtype, lifetime, authority):
+    """Ask the authoritative servers directly, falling back to the recursive resolver."""
+    started = time.monotonic()
+    if authority is not None:
+        # A short first try, so the fallback still fits in what is left of lifetime.
+        try:
+            return await _resolve(qname, rdtype, min(authority.timeout, lifetime / 2), authority,
+                                  raise_on_no_answer=False)
         except dns.resolver.NXDOMAIN:
+            raise
+        except Exception:
+            pass  # unreachable, refused or lame; let the recursive resolver try
+    remaining = lifetime - (time.monotonic() - started)
+    return await _resolve(qname, rdtype, remaining, raise_on_no_answer=False)
+
+async def get_dns_records(domain, timeout=DEFAULT_TIMEOUT):
+    # Sets dedupe as records arrive; MX entries are (priority, exchange) pairs.
+    # TXT uses a dict instead so entries keep the order they were first seen in.
+    records = {"A": set(), "AAAA": set(), "MX": set(), "NS": set(), "TXT": {}, "CNAME": set()}
+    record_types = list(records.keys())
+
+    # --- Look up NS first so the remaining types can go straight to the authority ---
+    # NXDOMAIN or a timeout here ends the run at once, as the other queries would fail the same way.
+    try:
+        ns_answer = await _resolve(domain, "NS", timeout, raise_on_no_answer=False)
+    except dns.resolver.NXDOMAIN:
+        print(f"Error: Domain '{domain}' not found (NXDOMAIN).")
+        return None
+    except dns.exception.Timeout:
+        print(f"Timeout while querying '{domain}'.")
+        return None
+    except Exception as e:
+        ns_answer = e  # reported with the other results below
+    ns_names = []
+    if ns_answer is not None and not isinstance(ns_answer, Exception):
+        ns_names = sorted({str(rdata).rstrip('.') for rdata in ns_answer})
+    ip_by_host = await _resolve_hostnames(ns_names, timeout)
+    authority = _authority_resolver(ip_by_host.values(), timeout)
+
+    # --- Query every other record type concurrently ---
+    other_types = [rt for rt in record_types if rt != "NS"]
+    results = dict(zip(other_types, await asyncio.gather(
+        *(_resolve_at_authority(domain, rt, timeout, authority) for rt in other_types),
+        return_exceptions=True,
+    )))
+    results["NS"] = ns_answer
+
+    for record_type in record_types:
+        result = results[record_type]
+        if result is None:
+            continue  # no records of this type
+        elif isinstance(result, dns.resolver.NXDOMAIN):
             print(f"Error: Domain '{domain}' not found (NXDOMAIN).")
             return None
-        except dns.exception.Timeout:
+        elif isinstance(result, dns.exception.Timeout):
             print(f"Timeout while querying '{domain}'.")
             return None
-        except Exception as e:
-            print(f"Unexpected error: {e}")
+        elif isinstance(result, Exception):
+            print(f"Unexpected error: {result}")
             continue
-    return records
+
+        for rdata in result:
+            if record_type == "MX":
+                records["MX"].add((rdata.preference, str(rdata.exchange).rstrip('.')))
+            elif record_type == "TXT":
+                records["TXT"][str(rdata).rstrip('.')] = None
+            else:
+                records[record_type].add(str(rdata).rstrip('.'))
+
+    # --- Resolve MX exchanges concurrently (NS names were resolved above) ---
+    hostnames = sorted({exchange for _, exchange in records["MX"]} - ip_by_host.keys())
+    ip_by_host.update(await _resolve_hostnames(hostnames, timeout))
+
+    return {
+        "A": sorted(records["A"]),
+        "AAAA": sorted(records["AAAA"]),
+        "MX": [{"priority": priority, "exchange": exchange, "ip": ip_by_host[exchange]}
+               for priority, exchange in sorted(records["MX"])],
+        "NS": [{"name": ns_name, "ip": ip_by_host[ns_name]} for ns_name in sorted(records["NS"])],
+        "TXT": list(records["TXT"]),
+        "CNAME": sorted(records["CNAME"]),
+    }
+
+# Header cell shading, built once and deep-copied into every header cell.
+_SHD_VAL = qn("w:val")
+_SHD_COLOR = qn("w:color")
+_SHD_FILL = qn("w:fill")
+_SHD_TEMPLATE = OxmlElement("w:shd")
+_SHD_TEMPLATE.set(_SHD_VAL, "clear")
+_SHD_TEMPLATE.set(_SHD_COLOR, "auto")
+_SHD_TEMPLATE.set(_SHD_FILL, "2F5496")  # color azul oscuro
 
 def add_stylish_table(document, headers, rows):
     """Add a styled table with custom formatting."""
@@ -71,18 +308,20 @@ def add_stylish_table(document, headers, rows):
         hdr_cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
 
         # --- Color de fondo corregido ---
-        shading = OxmlElement("w:shd")
-        shading.set(qn("w:val"), "clear")
-        shading.set(qn("w:color"), "auto")
-        shading.set(qn("w:fill"), "2F5496")  # color azul oscuro
+        shading = copy.deepcopy(_SHD_TEMPLATE)
         hdr_cells[i]._element.get_or_add_tcPr().append(shading)
 
     # --- Filas ---
+    # Each row is written as raw <w:tr> XML: one parse per row instead of several API calls per cell.
+    widths = [grid_col.get(qn("w:w")) for grid_col in table._tbl.tblGrid.gridCol_lst]
     for row in rows:
-        row_cells = table.add_row().cells
-        for i, value in enumerate(row):
-            row_cells[i].text = str(value)
-            row_cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        cells = "".join(
+            f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+            f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr>'
+            f'<w:r><w:t xml:space="preserve">{escape(str(value))}</w:t></w:r></w:p></w:tc>'
+            for width, value in zip(widths, row)
+        )
+        table._tbl.append(parse_xml(f'<w:tr {nsdecls("w")}>{cells}</w:tr>'))
 
     # Ajuste opcional de ancho de columnas
     for cell in table.columns[0].cells:
@@ -90,8 +329,21 @@ def add_stylish_table(document, headers, rows):
 
     return table
 
+def add_bullet_items(document, items):
+    """Append one 'List Bullet' paragraph per item directly to the body XML."""
+    style_id = document.styles['List Bullet'].style_id
+    body = document.element.body
+    for item in items:
+        body._insert_p(parse_xml(
+            f'<w:p {nsdecls("w")}><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>'
+            f'<w:r><w:t xml:space="preserve">{escape(item)}</w:t></w:r></w:p>'
+        ))
+
 def create_dns_report_doc(domain, dns_data, output_filename="informe_dns.docx"):
     document = Document()
+    now = datetime.now()
+    report_date = now.strftime("%d %B %Y")
+    report_datetime = now.strftime("%d %B %Y, %H:%M")
 
     # --- Margins ---
     for section in document.sections:
@@ -109,7 +361,7 @@ def create_dns_report_doc(domain, dns_data, output_filename="informe_dns.docx"):
 
     info = document.add_paragraph()
     info.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    info.add_run(datetime.now().strftime("%d %B %Y")).font.size = Pt(11)
+    info.add_run(report_date).font.size = Pt(11)
     document.add_page_break()
 
     # --- Header & Footer ---
@@ -126,7 +378,7 @@ def create_dns_report_doc(domain, dns_data, output_filename="informe_dns.docx"):
 
     # --- DNS Data ---
     document.add_heading("1. Overview", level=1)
-    document.add_paragraph(f"Below are the DNS records collected for the domain {domain}. The data were collected on {datetime.now().strftime('%d %B %Y, %H:%M')}.")
+    document.add_paragraph(f"Below are the DNS records collected for the domain {domain}. The data were collected on {report_datetime}.")
     document.add_paragraph()
 
     order = ["A", "AAAA", "MX", "NS", "TXT", "CNAME"]
@@ -145,23 +397,51 @@ def create_dns_report_doc(domain, dns_data, output_filename="informe_dns.docx"):
             rows = [[r["name"], r["ip"]] for r in data]
             add_stylish_table(document, ["Name Server", "IP Address"], rows)
         elif record_type in ["A", "AAAA", "CNAME", "TXT"]:
-            for item in data:
-                p = document.add_paragraph(style='List Bullet')
-                p.add_run(item)
+            add_bullet_items(document, data)
         document.add_paragraph()
 
     # --- Save ---
-    document.save(output_filename)
+    # Build the zip in memory and write it out in one go.
+    buffer = io.BytesIO()
+    document.save(buffer)
+    Path(output_filename).write_bytes(buffer.getvalue())
     print(f"Report successfully generated: {output_filename}")
 
+def _nameserver_ip(value):
+    """argparse type for --resolver: accept only a literal IPv4/IPv6 address."""
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not an IP address")
+
 # --- Run ---
 if __name__ == "__main__":
-    target_domain = input("Enter domain to analyze (e.g. example.com): ").strip()
+    parser = argparse.ArgumentParser(description="Gather DNS records for a domain into a docx report.")
+    parser.add_argument("domain", nargs="?", help="domain to analyze (prompted for if omitted)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds allowed per DNS query (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--resolver", metavar="IP", type=_nameserver_ip,
+                        help=f"DNS server to query first (default: {PRIMARY_NAMESERVER}); "
+                             "the domain's own authoritative server gives the lowest latency")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"don't read or write the on-disk DNS cache ({DNS_CACHE_FILE})")
+    args = parser.parse_args()
+    if args.resolver:
+        _resolver.nameservers = [args.resolver, FALLBACK_NAMESERVER]
+
+    target_domain = (args.domain or input("Enter domain to analyze (e.g. example.com): ")).strip()
     if not target_domain:
         print("No domain entered. Exiting.")
     else:
         print(f"Collecting DNS data for {target_domain}...")
-        data = get_dns_records(target_domain)
+        if not args.no_cache:
+            _disk_cache = shelve.open(DNS_CACHE_FILE)
+            _prune_disk_cache()
+        try:
+            data = asyncio.run(get_dns_records(target_domain, timeout=args.timeout))
+        finally:
+            if _disk_cache is not None:
+                _disk_cache.close()
         if data:
             filename = f"DNS_Report_{target_domain.replace('.', '_')}.docx"
             create_dns_report_doc(target_domain, data, filename)
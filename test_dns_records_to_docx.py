@@ -0,0 +1,124 @@
+import asyncio
+import shelve
+import socket
+import threading
+
+import dns.flags
+import dns.message
+import dns.rrset
+import pytest
+
+import dns_records_to_docx as report
+
+# How the stub name server answers each name.
+STUB_ADDRESSES = {"mx1.example.test": "192.0.2.1", "mx2.example.test": "192.0.2.2"}
+TRUNCATED = "big.example.test"     # answers with TC set
+DROPPED = "lost.example.test"      # never answered
+NO_A_RECORD = "v6.example.test"    # NOERROR, empty answer
+
+
+def _serve(sock):
+    while True:
+        try:
+            wire, client = sock.recvfrom(65535)
+        except OSError:
+            return
+        query = dns.message.from_wire(wire)
+        qname = query.question[0].name
+        name = str(qname).rstrip(".")
+        if name == DROPPED:
+            continue
+
+        # A stray reply with the wrong transaction id must be ignored.
+        stray = dns.message.make_response(query)
+        stray.id = (query.id + 1) % 65536
+        stray.answer.append(dns.rrset.from_text(qname, 60, "IN", "A", "203.0.113.66"))
+        sock.sendto(stray.to_wire(), client)
+
+        response = dns.message.make_response(query)
+        if name == TRUNCATED:
+            response.flags |= dns.flags.TC
+            response.answer.append(dns.rrset.from_text(qname, 60, "IN", "A", "203.0.113.99"))
+        elif name in STUB_ADDRESSES:
+            response.answer.append(dns.rrset.from_text(qname, 60, "IN", "A", STUB_ADDRESSES[name]))
+        sock.sendto(response.to_wire(), client)
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    threading.Thread(target=_serve, args=(sock,), daemon=True).start()
+    monkeypatch.setattr(report._resolver, "nameservers", ["127.0.0.1"])
+    monkeypatch.setattr(report._resolver, "port", sock.getsockname()[1])
+    monkeypatch.setattr(report, "_disk_cache", None)
+    yield
+    sock.close()
+
+
+def test_batch_resolve_matches_replies_by_txid(stub_server):
+    hostnames = list(STUB_ADDRESSES) + [TRUNCATED, DROPPED, NO_A_RECORD]
+    rrsets = report.batch_resolve(hostnames, timeout=0.5)
+    assert {host: str(rrset[0]) for host, rrset in rrsets.items()} == STUB_ADDRESSES
+
+
+def test_batch_resolve_skips_non_ip_nameservers(monkeypatch):
+    monkeypatch.setattr(report._resolver, "nameservers", ["https://dns.google/dns-query", "8.8.8.8"])
+    assert report.batch_resolve(["mx1.example.test"], timeout=0.5) == {}
+
+
+def test_resolve_hostnames_falls_back_within_budget(stub_server, monkeypatch):
+    fallback = {}
+
+    async def fake_resolve(hostname, lifetime):
+        fallback[hostname] = lifetime
+        return "N/A"
+
+    monkeypatch.setattr(report, "resolve_hostname_to_ip_async", fake_resolve)
+    hostnames = ["mx1.example.test", TRUNCATED, DROPPED]
+    ip_by_host = asyncio.run(report._resolve_hostnames(hostnames, timeout=1.0))
+
+    assert ip_by_host == {"mx1.example.test": "192.0.2.1", TRUNCATED: "N/A", DROPPED: "N/A"}
+    assert set(fallback) == {TRUNCATED, DROPPED}
+    assert all(0 < lifetime <= 0.5 for lifetime in fallback.values())
+
+
+class _MainThreadShelf:
+    """Wraps a real shelf and fails if it is touched off the main thread, as dbm.sqlite3 does."""
+
+    def __init__(self, shelf):
+        self.shelf = shelf
+
+    def _check(self):
+        assert threading.current_thread() is threading.main_thread()
+
+    def get(self, key):
+        self._check()
+        return self.shelf.get(key)
+
+    def __setitem__(self, key, value):
+        self._check()
+        self.shelf[key] = value
+
+
+def test_resolve_hostnames_uses_disk_cache_on_main_thread(stub_server, monkeypatch, tmp_path):
+    real_resolve = report.resolve_hostname_to_ip_async
+
+    async def unexpected(hostname, lifetime):
+        raise AssertionError(f"{hostname} should have come from the batch")
+
+    def no_network(todo, timeout):
+        assert not todo, "cached names must not be sent again"
+        return {}
+
+    with shelve.open(str(tmp_path / "dns_cache")) as shelf:
+        monkeypatch.setattr(report, "_disk_cache", _MainThreadShelf(shelf))
+
+        monkeypatch.setattr(report, "resolve_hostname_to_ip_async", unexpected)
+        hostnames = list(STUB_ADDRESSES)
+        assert asyncio.run(report._resolve_hostnames(hostnames, timeout=1.0)) == STUB_ADDRESSES
+
+        # Second run: the batch gets nothing to send and the answers come from the shelf.
+        monkeypatch.setattr(report, "batch_resolve", no_network)
+        monkeypatch.setattr(report, "resolve_hostname_to_ip_async", real_resolve)
+        assert asyncio.run(report._resolve_hostnames(hostnames, timeout=1.0)) == STUB_ADDRESSES